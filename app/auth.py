@@ -1,17 +1,20 @@
 import json
 from collections.abc import Mapping
 import typing as t
-from jose import jws, JWSError
+from jose import jwk, jws, JWSError
 from . import errors
 from .settings import settings
 
+# Building the key is done once, instead of once per signed or verified token
+_key = jwk.construct(settings.secret, "HS256")
+
 
 def jws_verify(token: str) -> Mapping[str, t.Any]:
     """
     Verify the content of a JWS token
     """
     try:
-        data = jws.verify(token, settings.secret, algorithms=["HS256"])
+        data = jws.verify(token, _key, algorithms=["HS256"])
     except JWSError:
         raise errors.UnauthorizedError("Can not decode token")
 
@@ -33,7 +36,7 @@ def create_ballot_token(
     vote_ids = sorted(vote_ids)
     return jws.sign(
         {"votes": vote_ids, "election": election_ref},
-        settings.secret,
+        _key,
         algorithm="HS256",
     )
 
@@ -43,6 +46,6 @@ def create_admin_token(
 ) -> str:
     return jws.sign(
         {"admin": True, "election": election_ref},
-        settings.secret,
+        _key,
         algorithm="HS256",
     )
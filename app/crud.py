@@ -1,11 +1,13 @@
 from datetime import datetime
 import random
 import string
+import threading
+import time
 from collections import defaultdict
+from itertools import chain
 import typing as t
-from sqlalchemy.orm import Session
-from sqlalchemy import func, insert
-from majority_judgment import majority_judgment, Candidate, Vote
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import ColumnElement, func, insert, select, update
 from . import models, schemas, errors
 from .settings import settings
 from .auth import create_ballot_token, create_admin_token, jws_verify
@@ -16,26 +18,84 @@ def get_election(db: Session, election_ref_or_id: str):
     Load an election given its ID or its ref
     """
     if election_ref_or_id.isnumeric():
-        elections = db.query(models.Election).filter(
-            models.Election.id == election_ref_or_id
-        )
+        criterion = models.Election.id == election_ref_or_id
     else:
-        elections = db.query(models.Election).filter(
-            models.Election.ref == election_ref_or_id
-        )
+        criterion = models.Election.ref == election_ref_or_id
 
-    if elections.count() > 1:
+    # Fetch at most two rows: enough to detect duplicates in a single query
+    elections = db.query(models.Election).filter(criterion).limit(2).all()
+
+    if len(elections) > 1:
         raise errors.InconsistentDatabaseError(
             "elections",
             f"Several elections have the same primary keys {election_ref_or_id}",
         )
 
-    if elections.count() == 1:
-        return elections.first()
+    if len(elections) == 1:
+        return elections[0]
 
     raise errors.NotFoundError("elections")
 
 
+_election_cache: dict[str, tuple[float, schemas.ElectionGet]] = {}
+_election_cache_lock = threading.Lock()
+# Bumped on each invalidation, so that details loaded before an update
+# are not written back into the cache after it
+_election_cache_generation = 0
+
+
+def get_election_details(db: Session, election_ref_or_id: str) -> schemas.ElectionGet:
+    """
+    Load the public details of an election, using a short-lived in-process cache
+    """
+    now = time.monotonic()
+    with _election_cache_lock:
+        cached = _election_cache.pop(election_ref_or_id, None)
+        if cached is not None and cached[0] > now:
+            # Move the entry to the end: it is now the most recently used
+            _election_cache[election_ref_or_id] = cached
+            return cached[1]
+        generation = _election_cache_generation
+
+    db_election = get_election(db, election_ref_or_id)
+    election = schemas.ElectionGet.from_orm(db_election)
+
+    if (
+        settings.election_cache_ttl <= 0
+        or settings.election_cache_size <= 0
+        or len(election.candidates) > settings.election_cache_max_candidates
+    ):
+        return election
+
+    with _election_cache_lock:
+        if generation != _election_cache_generation:
+            return election
+
+        _election_cache.pop(election_ref_or_id, None)
+        while len(_election_cache) >= settings.election_cache_size:
+            # Dicts keep the insertion order: drop the least recently used entry
+            del _election_cache[next(iter(_election_cache))]
+        _election_cache[election_ref_or_id] = (
+            now + settings.election_cache_ttl,
+            election,
+        )
+
+    return election
+
+
+def _invalidate_election_cache(election_ref: str):
+    """
+    Drop the cached details of an election, whatever key was used to load them
+    """
+    global _election_cache_generation
+
+    with _election_cache_lock:
+        _election_cache_generation += 1
+        for key, (_, election) in list(_election_cache.items()):
+            if election.ref == election_ref:
+                _election_cache.pop(key, None)
+
+
 def get_progress(db: Session, election_ref: str, token: str) -> schemas.Progress:
     """
     Load an election given its ID or its ref
@@ -48,19 +108,26 @@ def get_progress(db: Session, election_ref: str, token: str) -> schemas.Progress
     if not payload["admin"]:
         raise errors.ForbiddenError("You are not allowed to manage the election")
 
-    # Votes are provided for each candidate and each voter
-    votes = db.query(models.Vote).filter(models.Vote.election_ref == election_ref)
-    candidates = db.query(models.Candidate).filter(
-        models.Candidate.election_ref == election_ref
+    # Votes are provided for each candidate and each voter.
+    # Voters who have voted have a non-null grade.
+    # All counts are computed by a single query.
+    num_candidates_query = (
+        select(func.count(models.Candidate.id))
+        .where(models.Candidate.election_ref == election_ref)
+        .scalar_subquery()
+    )
+    num_votes, num_votes_voted, num_candidates = (
+        db.query(
+            func.count(),
+            func.count(models.Vote.grade_id),
+            num_candidates_query,
+        )
+        .filter(models.Vote.election_ref == election_ref)
+        .one()
     )
 
-    num_votes = votes.count()
-    num_candidates = candidates.count()
     num_voters = num_votes // num_candidates
-
-    # Get number of voters who have voted (their grade is not null)
-    voters_voted = votes.filter(models.Vote.grade != None)
-    num_voters_voted = voters_voted.count() // num_candidates
+    num_voters_voted = num_votes_voted // num_candidates
 
     return schemas.Progress(
         num_voters=num_voters,
@@ -205,12 +272,19 @@ def create_invite_tokens(
     num_candidates: int,
     num_voters: int,
 ) -> list[str]:
+    if num_voters == 0:
+        return []
+
     now = datetime.now()
     params = {"date_created": now, "date_modified": now, "election_ref": election_ref}
-    db_votes = [models.Vote(**params) for _ in range(num_voters * num_candidates)]
-    db.bulk_save_objects(db_votes, return_defaults=True)
+    # A single multi-row INSERT ... RETURNING instead of one INSERT per vote
+    vote_ids: list[int] = list(
+        db.scalars(
+            insert(models.Vote).returning(models.Vote.id),
+            [params] * (num_voters * num_candidates),
+        )
+    )
     db.commit()
-    vote_ids = [int(str(v.id)) for v in db_votes]
     tokens = [
         create_ballot_token(vote_ids[i::num_voters], election_ref)
         for i in range(num_voters)
@@ -238,15 +312,15 @@ def create_election(
     election_ref = str(db_election.ref)
 
     # Then, we add separatly candidates and grades
-    for candidate in election.candidates:
-        params = candidate.dict()
-        candidate = schemas.CandidateCreate(**params)
-        create_candidate(db, candidate, election_ref, False)
+    # with one multi-row INSERT per table.
+    # They were validated with the election: no need to build new schemas.
+    candidate_rows = [
+        {**c.dict(), "election_ref": election_ref} for c in election.candidates
+    ]
+    db.execute(insert(models.Candidate), candidate_rows)
 
-    for grade in election.grades:
-        params = grade.dict()
-        grade = schemas.GradeCreate(**params)
-        create_grade(db, grade, election_ref, False)
+    grade_rows = [{**g.dict(), "election_ref": election_ref} for g in election.grades]
+    db.execute(insert(models.Grade), grade_rows)
 
     db.commit()
     db.refresh(db_election)
@@ -333,6 +407,7 @@ def update_election(
 
     db.commit()
     db.refresh(db_election)
+    _invalidate_election_cache(election_ref)
 
     updated_election = schemas.ElectionUpdatedGet.from_orm(db_election)
 
@@ -373,21 +448,42 @@ def create_ballot(db: Session, ballot: schemas.BallotCreate) -> schemas.BallotGe
     )
     _check_ballot_is_consistent(election, ballot)
 
-    # Ideally, we would use RETURNING but it does not work yet for SQLite
-    db_votes = [
-        models.Vote(**v.dict(), election_ref=ballot.election_ref) for v in ballot.votes
+    # A single multi-row INSERT ... RETURNING provides the ids of the new votes
+    vote_rows = [
+        {**v.dict(), "election_ref": ballot.election_ref} for v in ballot.votes
     ]
-    db.add_all(db_votes)
+    vote_ids: list[int] = list(
+        db.scalars(insert(models.Vote).returning(models.Vote.id), vote_rows)
+    )
     db.commit()
-    for v in db_votes:
-        db.refresh(v)
+
+    # Then, reload them with their candidate and grade at once
+    db_votes = _load_votes(db, vote_ids)
 
     votes_get = [schemas.VoteGet.from_orm(v) for v in db_votes]
-    vote_ids = [v.id for v in votes_get]
     token = create_ballot_token(vote_ids, ballot.election_ref)
     return schemas.BallotGet(votes=votes_get, token=token, election=election)
 
 
+def _load_votes(
+    db: Session,
+    vote_ids: t.Sequence[int],
+    criterion: ColumnElement[bool] | None = None,
+) -> list[models.Vote]:
+    """
+    Load votes ordered by id, along with their candidate and grade,
+    to avoid one query per vote when they are serialized.
+    """
+    query = db.query(models.Vote).filter(models.Vote.id.in_(vote_ids))
+    if criterion is not None:
+        query = query.filter(criterion)
+    return (
+        query.options(joinedload(models.Vote.candidate), joinedload(models.Vote.grade))
+        .order_by(models.Vote.id)
+        .all()
+    )
+
+
 def _check_public_election(db: Session, election_ref: str):
     # Check if the election is open
     db_election = get_election(db, election_ref)
@@ -446,27 +542,42 @@ def update_ballot(
         db, [v.grade_id for v in ballot.votes], election_ref, models.Grade
     )
 
-    # TODO Can we optimize it with a bulk update?
+    # Rows are locked until the commit, so that concurrent updates of the same
+    # ballot are applied one after the other. Locking them in the order of their
+    # ids prevents deadlocks.
     db_votes = (
         db.query(models.Vote)
         .filter(
             models.Vote.id.in_(vote_ids)
         )  # & (models.Vote.election_ref == election_ref))
+        .order_by(models.Vote.id)
+        .with_for_update()
         .all()
     )
 
     if len(db_votes) != len(vote_ids):
         raise errors.NotFoundError("votes")
 
-    election = schemas.ElectionGet.from_orm(db_votes[0].election)
+    election = schemas.ElectionGet.from_orm(db_election)
 
+    # Bulk UPDATE by primary key, writing only the candidate and the grade
+    vote_rows = []
     for vote, db_vote in zip(ballot.votes, db_votes):
         if db_vote.election_ref != election_ref:
             raise errors.BadRequestError("Wrong election id")
-        setattr(db_vote, "candidate_id", vote.candidate_id)
-        setattr(db_vote, "grade_id", vote.grade_id)
+        vote_rows.append(
+            {
+                "id": db_vote.id,
+                "candidate_id": vote.candidate_id,
+                "grade_id": vote.grade_id,
+            }
+        )
+    db.execute(update(models.Vote), vote_rows)
     db.commit()
 
+    # Reload the votes with their candidate and grade at once
+    db_votes = _load_votes(db, vote_ids)
+
     votes_get = [schemas.VoteGet.from_orm(v) for v in db_votes]
     token = create_ballot_token(vote_ids, election_ref)
     return schemas.BallotGet(votes=votes_get, token=token, election=election)
@@ -477,24 +588,26 @@ def get_ballot(db: Session, token: str) -> schemas.BallotGet:
     vote_ids = data["votes"]
     election_ref = data["election"]
 
-    votes = db.query(models.Vote).filter(
-        models.Vote.id.in_((vote_ids))
-        & (models.Vote.candidate_id.is_not(None))
-        & (models.Vote.election_ref == election_ref)
+    db_votes = _load_votes(
+        db,
+        vote_ids,
+        (models.Vote.candidate_id.is_not(None))
+        & (models.Vote.election_ref == election_ref),
     )
 
-    db_votes = list(votes.all())
-
     if db_votes == []:
         raise errors.NotFoundError("votes")
 
     election = db_votes[0].election
 
-    votes_get = [schemas.VoteGet.from_orm(v) for v in votes.all()]
+    votes_get = [schemas.VoteGet.from_orm(v) for v in db_votes]
     return schemas.BallotGet(token=token, votes=votes_get, election=election)
 
 
 def get_results(db: Session, election_ref: str) -> schemas.ResultsGet:
+    # Only needed here: avoid loading the library when a worker starts
+    from majority_judgment import majority_judgment, Candidate, Vote
+
     db_election = get_election(db, election_ref)
     if db_election is None:
         raise errors.NotFoundError("elections")
@@ -506,13 +619,14 @@ def get_results(db: Session, election_ref: str) -> schemas.ResultsGet:
     ):
         raise errors.ForbiddenError("The election is not closed")
 
-    query = db.query(
-        models.Vote.candidate_id, models.Grade.value, func.count(models.Vote.id)
-    )
+    query = db.query(models.Vote.candidate_id, models.Grade.value, func.count())
+    # Only the grade value is needed: candidates are not joined
     db_res = (
         query.join(models.Vote.grade)
-        .join(models.Vote.candidate)
-        .filter(models.Vote.election_ref == db_election.ref)
+        .filter(
+            (models.Vote.election_ref == db_election.ref)
+            & (models.Vote.candidate_id.is_not(None))
+        )
         .group_by(models.Vote.candidate_id, models.Grade.value)
         .all()
     )
@@ -524,19 +638,15 @@ def get_results(db: Session, election_ref: str) -> schemas.ResultsGet:
     for candidate_id, grade_value, num_votes in db_res:
         ballots[candidate_id][grade_value] = num_votes
 
-    merit_profile2 = {
-        c: {value: votes[value] for value in votes.keys()}
-        for c, votes in ballots.items()
-    }
-
+    # Grades are expanded in increasing order: no need to sort the votes
     merit_profile: dict[Candidate, list[Vote]] = {
-        c: sorted(sum([[value] * votes[value] for value in votes.keys()], []))
+        c: list(chain.from_iterable([value] * votes[value] for value in sorted(votes)))
         for c, votes in ballots.items()
     }
 
     ranking = majority_judgment(merit_profile)  # pyright: ignore
     db_election.ranking = ranking
-    db_election.merit_profile = merit_profile2
+    db_election.merit_profile = dict(ballots)
 
     results = schemas.ResultsGet.from_orm(db_election)
 
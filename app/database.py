@@ -16,7 +16,12 @@ else:
         f"@{settings.postgres_host}:{settings.postgres_port}"
         f"/{settings.postgres_name}"
     )
-    engine = create_engine(database_url)
+    engine = create_engine(
+        database_url,
+        pool_size=settings.postgres_pool_size,
+        max_overflow=settings.postgres_max_overflow,
+        pool_pre_ping=True,
+    )
 
 SessionLocal: sessionmaker = sessionmaker(  # type: ignore
     autocommit=False, autoflush=False, bind=engine
@@ -1,11 +1,7 @@
-import typing as t
-import json
-from fastapi import Depends, FastAPI, HTTPException, Request, Body, Header
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi import Depends, FastAPI, Request, Header
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from jose import jwe, jws
-from jose.exceptions import JWEError, JWSError
 
 from . import crud, models, schemas, errors
 from .database import get_db, engine, Base
@@ -89,8 +85,7 @@ def read_root():
 
 @app.get("/elections/{election_ref}", response_model=schemas.ElectionGet)
 def read_election_all_details(election_ref: str, db: Session = Depends(get_db)):
-    db_election = crud.get_election(db, election_ref)
-    return db_election
+    return crud.get_election_details(db, election_ref)
 
 
 @app.get("/elections/{election_ref}/progress", response_model=schemas.Progress)
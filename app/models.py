@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -35,7 +35,7 @@ class Candidate(Base):
     date_created = Column(DateTime, server_default=func.now())
     date_modified = Column(DateTime, onupdate=func.now())
 
-    election_ref = Column(String(20), ForeignKey("elections.ref"))
+    election_ref = Column(String(20), ForeignKey("elections.ref"), index=True)
     election = relationship("Election", back_populates="candidates")
 
     votes = relationship("Vote", back_populates="candidate")
@@ -51,7 +51,7 @@ class Grade(Base):
     date_created = Column(DateTime, server_default=func.now())
     date_modified = Column(DateTime, onupdate=func.now())
 
-    election_ref = Column(String(20), ForeignKey("elections.ref"))
+    election_ref = Column(String(20), ForeignKey("elections.ref"), index=True)
     election = relationship("Election", back_populates="grades")
 
     votes = relationship("Vote", back_populates="grade")
@@ -71,3 +71,14 @@ class Vote(Base):
 
     election_ref = Column(String(20), ForeignKey("elections.ref"))
     election = relationship("Election", back_populates="votes")
+
+    # Results and progress only read these columns for a given election,
+    # so they can be answered from the index without visiting the table
+    __table_args__ = (
+        Index(
+            "ix_votes_election_ref_candidate_grade",
+            election_ref,
+            candidate_id,
+            grade_id,
+        ),
+    )
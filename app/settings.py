@@ -14,11 +14,21 @@ class Settings(BaseSettings):
     postgres_name: str = "mj"
     postgres_host: str = "mj_db"
     postgres_port: int = 5432
+    postgres_pool_size: int = 20
+    postgres_max_overflow: int = 20
 
     max_grades: int = 100
     max_candidates: int = 1000
     max_voters: int = 1_000_000
 
+    # Election details are cached in each process, evicting the least recently
+    # used entry once the size is reached. Set either the TTL or the size to 0
+    # to disable it. Elections with more candidates are never cached, to bound
+    # the memory of an entry.
+    election_cache_ttl: float = 30
+    election_cache_size: int = 128
+    election_cache_max_candidates: int = 50
+
     allowed_origins: list[str] = ["http://localhost"]
 
     class Config:
@@ -3,14 +3,16 @@ import copy
 from datetime import datetime, timedelta
 import typing as t
 import random
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.auth import jws_verify
 from ..database import Base, get_db
-from .. import schemas
+from .. import crud, models, schemas
 from ..main import app
+from ..settings import settings
 
 test_database_url = "sqlite:///./test.db"
 test_engine = create_engine(
@@ -126,6 +128,141 @@ def test_get_election():
     assert db_grade_names == req_grade_names, db_grade_names
 
 
+def test_get_election_after_update():
+    body = _random_election(3, 4)
+    response = client.post("/elections", json=body)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    election_ref = data["ref"]
+    token = data["admin"]
+
+    # Read the election once, so that its details are cached
+    response = client.get(f"/elections/{election_ref}")
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == body["name"]
+
+    # The update must be visible on the next read
+    new_name = f'{data["name"]}_MODIFIED'
+    data["name"] = new_name
+    response = client.put(
+        f"/elections", json=data, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+
+    response = client.get(f"/elections/{election_ref}")
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == new_name
+
+
+def _rename_election_in_db(election_ref: str, name: str):
+    """
+    Rename an election behind the back of the cache
+    """
+    db = TestingSessionLocal()
+    db.query(models.Election).filter(models.Election.ref == election_ref).update(
+        {"name": name}
+    )
+    db.commit()
+    db.close()
+
+
+def _create_election_ref() -> str:
+    response = client.post("/elections", json=_random_election(2, 2))
+    assert response.status_code == 200, response.text
+    return response.json()["ref"]
+
+
+def _read_election_name(election_ref: str) -> str:
+    response = client.get(f"/elections/{election_ref}")
+    assert response.status_code == 200, response.text
+    return response.json()["name"]
+
+
+def test_election_cache_expires(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(crud, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(settings, "election_cache_ttl", 30)
+    election_ref = _create_election_ref()
+
+    name = _read_election_name(election_ref)
+    _rename_election_in_db(election_ref, f"{name}_MODIFIED")
+
+    # The cached details are served until the TTL is reached
+    clock[0] += 29
+    assert _read_election_name(election_ref) == name
+
+    clock[0] += 2
+    assert _read_election_name(election_ref) == f"{name}_MODIFIED"
+
+
+def test_election_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(settings, "election_cache_ttl", 30)
+    monkeypatch.setattr(settings, "election_cache_size", 2)
+    crud._election_cache.clear()
+    first_ref = _create_election_ref()
+    second_ref = _create_election_ref()
+    third_ref = _create_election_ref()
+
+    first_name = _read_election_name(first_ref)
+    second_name = _read_election_name(second_ref)
+    # A hit makes the first election the most recently used one
+    _read_election_name(first_ref)
+    _read_election_name(third_ref)
+    assert list(crud._election_cache) == [first_ref, third_ref]
+
+    _rename_election_in_db(first_ref, f"{first_name}_MODIFIED")
+    _rename_election_in_db(second_ref, f"{second_name}_MODIFIED")
+    assert _read_election_name(first_ref) == first_name
+    assert _read_election_name(second_ref) == f"{second_name}_MODIFIED"
+
+
+def test_election_cache_skips_large_elections(monkeypatch):
+    monkeypatch.setattr(settings, "election_cache_max_candidates", 2)
+    response = client.post("/elections", json=_random_election(3, 2))
+    assert response.status_code == 200, response.text
+    large_ref = response.json()["ref"]
+    small_ref = _create_election_ref()
+
+    _read_election_name(large_ref)
+    _read_election_name(small_ref)
+    assert large_ref not in crud._election_cache
+    assert small_ref in crud._election_cache
+
+
+def test_election_cache_can_be_disabled(monkeypatch):
+    election_ref = _create_election_ref()
+
+    for key, value in [("election_cache_ttl", 0), ("election_cache_size", 0)]:
+        monkeypatch.setattr(settings, key, value)
+        name = _read_election_name(election_ref)
+        _rename_election_in_db(election_ref, f"{name}_MODIFIED")
+        assert _read_election_name(election_ref) == f"{name}_MODIFIED"
+        assert election_ref not in crud._election_cache
+        monkeypatch.undo()
+
+
+def test_election_cache_skips_details_loaded_before_an_update(monkeypatch):
+    election_ref = _create_election_ref()
+    name = _read_election_name(election_ref)
+    crud._election_cache.clear()
+
+    # Simulate an update that is committed while a reader loads the election
+    get_election = crud.get_election
+
+    def get_election_then_update(db, election_ref_or_id):
+        db_election = get_election(db, election_ref_or_id)
+        _rename_election_in_db(election_ref, f"{name}_MODIFIED")
+        crud._invalidate_election_cache(election_ref)
+        return db_election
+
+    monkeypatch.setattr(crud, "get_election", get_election_then_update)
+    assert _read_election_name(election_ref) == name
+    monkeypatch.undo()
+
+    assert election_ref not in crud._election_cache
+    assert _read_election_name(election_ref) == f"{name}_MODIFIED"
+
+
 def _generate_votes_from_response(
     mode: t.Literal["id", "name", "value"],
     data: dict[str, t.Any],
@@ -0,0 +1,36 @@
+"""Add indexes on election refs
+
+Revision ID: 48d5f3454ef0
+Revises:
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "48d5f3454ef0"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Base.metadata.create_all already creates them on fresh databases
+INDEXES = {
+    "ix_candidates_election_ref": "candidates (election_ref)",
+    "ix_grades_election_ref": "grades (election_ref)",
+    "ix_votes_election_ref_candidate_grade": (
+        "votes (election_ref, candidate_id, grade_id)"
+    ),
+}
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")